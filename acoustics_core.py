@@ -3,11 +3,25 @@ Acoustics Simulation Library - Core Module
 Supports multi-source, multi-mic 3D acoustic simulation with material properties
 """
 
+import functools
+import math
 import numpy as np
 from dataclasses import dataclass
-from typing import List, Tuple, Optional, Callable
+from typing import List, Callable, Union, NamedTuple
 from enum import Enum
 import json
+import sys
+from types import MappingProxyType
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# Octave band centre frequencies (Hz) used by all frequency-dependent data
+FREQ_BANDS = np.array([125, 250, 500, 1000, 2000, 4000])
+_FREQS_K = (FREQ_BANDS / 1000.0).astype(np.float32)  # Band frequencies in kHz
 
 # ============================================================================
 # Material Properties Database
@@ -23,6 +37,10 @@ class MaterialProperties:
     density: float  # kg/m³
     speed_of_sound: float  # m/s
     impedance: float  # Rayl
+    
+    def __post_init__(self):
+        self.absorption_coeff = np.asarray(self.absorption_coeff, dtype=np.float32)
+        self.reflection_coeff = np.asarray(self.reflection_coeff, dtype=np.float32)
 
 class MaterialDatabase:
     """Database of common material acoustic properties"""
@@ -145,10 +163,36 @@ class MaterialDatabase:
         ),
     }
     
+    # Case-insensitive lookups keyed by interned lowercase names
+    _MATERIALS_CI = MappingProxyType({sys.intern(name.lower()): mat
+                                      for name, mat in MATERIALS.items()})
+    
+    # Integer material ids and per-id coefficient tables, indexed as TABLE[mat_idx]
+    _NAMES = list(_MATERIALS_CI)
+    _NAME_TO_IDX = MappingProxyType({name: i for i, name in enumerate(_NAMES)})
+    REFL_TABLE = np.stack([mat.reflection_coeff for mat in MATERIALS.values()])  # (K, 6)
+    ABS_TABLE = np.stack([mat.absorption_coeff for mat in MATERIALS.values()])  # (K, 6)
+    DIFF_TABLE = np.array([mat.diffusion_coeff for mat in MATERIALS.values()],
+                          dtype=np.float32)  # (K,)
+    
     @classmethod
-    def get_material(cls, name: str) -> MaterialProperties:
-        """Get material properties by name"""
-        return cls.MATERIALS.get(name.lower(), cls.MATERIALS['concrete'])
+    def get_material(cls, name: Union[str, int]) -> MaterialProperties:
+        """Get material properties by name or integer id"""
+        if isinstance(name, (int, np.integer)):
+            return cls._MATERIALS_CI[cls._NAMES[name]]
+        # Lowercase keys hit directly; only other spellings pay for name.lower()
+        mat = cls._MATERIALS_CI.get(name)
+        if mat is None:
+            mat = cls._MATERIALS_CI.get(name.lower(), cls._MATERIALS_CI['concrete'])
+        return mat
+    
+    @classmethod
+    def material_id(cls, name: str) -> int:
+        """Get integer material id by name (row index into the coefficient tables)"""
+        idx = cls._NAME_TO_IDX.get(name)
+        if idx is None:
+            idx = cls._NAME_TO_IDX.get(name.lower(), cls._NAME_TO_IDX['concrete'])
+        return idx
     
     @classmethod
     def list_materials(cls) -> List[str]:
@@ -205,19 +249,23 @@ class MediumDatabase:
     @classmethod
     def get_medium(cls, name: str) -> MediumProperties:
         """Get medium properties by name"""
-        return cls.MEDIA.get(name.lower(), cls.MEDIA['air'])
+        # Lowercase keys hit directly; only other spellings pay for name.lower()
+        medium = cls.MEDIA.get(name)
+        if medium is None:
+            medium = cls.MEDIA.get(name.lower(), cls.MEDIA['air'])
+        return medium
 
 # ============================================================================
 # 3D Geometry
 # ============================================================================
 
-@dataclass
-class Vector3:
-    """3D vector"""
+class Vector3(NamedTuple):
+    """3D vector (immutable tuple: no per-instance __dict__, C-level construction)"""
     x: float
     y: float
     z: float
     
+    # Arithmetic is vector arithmetic, not tuple concatenation/repetition
     def __add__(self, other):
         return Vector3(self.x + other.x, self.y + other.y, self.z + other.z)
     
@@ -227,6 +275,8 @@ class Vector3:
     def __mul__(self, scalar):
         return Vector3(self.x * scalar, self.y * scalar, self.z * scalar)
     
+    __rmul__ = __mul__
+    
     def dot(self, other):
         return self.x * other.x + self.y * other.y + self.z * other.z
     
@@ -238,7 +288,7 @@ class Vector3:
         )
     
     def length(self):
-        return np.sqrt(self.x**2 + self.y**2 + self.z**2)
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
     
     def normalize(self):
         l = self.length()
@@ -247,22 +297,24 @@ class Vector3:
         return Vector3(0, 0, 0)
     
     def to_array(self):
-        return np.array([self.x, self.y, self.z])
+        return np.array(self, dtype=np.float64)
 
-@dataclass
+@dataclass(frozen=True)
 class Triangle:
-    """Triangle face with material"""
+    """Triangle face with material (immutable; derived properties are cached)"""
     v0: Vector3
     v1: Vector3
     v2: Vector3
     material: str
     
+    @functools.cached_property
     def normal(self) -> Vector3:
         """Calculate surface normal"""
         edge1 = self.v1 - self.v0
         edge2 = self.v2 - self.v0
         return edge1.cross(edge2).normalize()
     
+    @functools.cached_property
     def center(self) -> Vector3:
         """Calculate centroid"""
         return Vector3(
@@ -271,17 +323,101 @@ class Triangle:
             (self.v0.z + self.v1.z + self.v2.z) / 3
         )
     
+    @functools.cached_property
     def area(self) -> float:
         """Calculate surface area"""
         edge1 = self.v1 - self.v0
         edge2 = self.v2 - self.v0
         return edge1.cross(edge2).length() / 2.0
 
+class Geometry:
+    """Triangle mesh stored as contiguous (N, 3) vertex arrays (structure of arrays)
+
+    Per-triangle properties (edges, unit normals, centroids, areas) are computed
+    once for the whole mesh so ray tracing can work on all triangles at once.
+    Materials are stored as MaterialDatabase ids in mat_idx.
+    """
+    
+    def __init__(self, v0: np.ndarray, v1: np.ndarray, v2: np.ndarray,
+                 mat_idx: np.ndarray):
+        self.v0 = np.ascontiguousarray(v0, dtype=np.float32).reshape(-1, 3)
+        self.v1 = np.ascontiguousarray(v1, dtype=np.float32).reshape(-1, 3)
+        self.v2 = np.ascontiguousarray(v2, dtype=np.float32).reshape(-1, 3)
+        self.mat_idx = np.ascontiguousarray(mat_idx, dtype=np.int32)
+        
+        self.edge1 = self.v1 - self.v0
+        self.edge2 = self.v2 - self.v0
+        cross = np.cross(self.edge1, self.edge2)
+        length = np.linalg.norm(cross, axis=1)
+        self.normals = np.divide(cross, length[:, None], out=np.zeros_like(cross),
+                                 where=length[:, None] > 0)
+        self.areas = length / 2.0
+        self.centers = (self.v0 + self.v1 + self.v2) / 3
+    
+    @classmethod
+    def from_triangles(cls, triangles: List[Triangle]) -> 'Geometry':
+        """Flatten a list of triangles into a Geometry"""
+        return cls(
+            np.array([tri.v0 for tri in triangles], dtype=np.float32),
+            np.array([tri.v1 for tri in triangles], dtype=np.float32),
+            np.array([tri.v2 for tri in triangles], dtype=np.float32),
+            np.array([MaterialDatabase.material_id(tri.material) for tri in triangles],
+                     dtype=np.int32)
+        )
+    
+    def __len__(self) -> int:
+        return len(self.mat_idx)
+    
+    def __getitem__(self, i: int) -> Triangle:
+        """Rebuild triangle i as a Triangle object"""
+        return Triangle(
+            Vector3(*self.v0[i].tolist()), Vector3(*self.v1[i].tolist()),
+            Vector3(*self.v2[i].tolist()),
+            MaterialDatabase._NAMES[self.mat_idx[i]]
+        )
+    
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+# Rays x triangles per broadcast block in _intersect_rays_xp, bounds temporaries to ~50 MB each
+_XP_BLOCK = 1 << 22
+
+def _intersect_rays_xp(xp, origins, dirs, tri_v0, edge1, edge2, eps: float = 1e-9):
+    """All-pairs Möller–Trumbore in array module xp (numpy or cupy): nearest (t, idx) per ray"""
+    if tri_v0.shape[0] == 0:
+        # No geometry: every ray misses
+        return (xp.full(origins.shape[0], xp.inf, dtype=xp.float32),
+                xp.full(origins.shape[0], -1, dtype=xp.int64))
+    
+    rows = max(1, _XP_BLOCK // tri_v0.shape[0])
+    out_t = xp.empty(origins.shape[0], dtype=xp.float32)
+    out_idx = xp.empty(origins.shape[0], dtype=xp.int64)
+    for start in range(0, origins.shape[0], rows):
+        o = origins[start:start + rows, None, :]
+        d = dirs[start:start + rows, None, :]
+        p = xp.cross(d, edge2)
+        det = (edge1 * p).sum(axis=-1)
+        valid = xp.abs(det) > eps
+        inv_det = 1.0 / xp.where(valid, det, 1.0)
+        s = o - tri_v0
+        u = (s * p).sum(axis=-1) * inv_det
+        q = xp.cross(s, edge1)
+        v = (d * q).sum(axis=-1) * inv_det
+        t = (edge2 * q).sum(axis=-1) * inv_det
+        hit = valid & (u >= 0) & (v >= 0) & (u + v <= 1) & (t > eps)
+        t = xp.where(hit, t, xp.inf)
+        
+        idx = xp.argmin(t, axis=1)
+        best = xp.take_along_axis(t, idx[:, None], axis=1)[:, 0]
+        out_t[start:start + rows] = best
+        out_idx[start:start + rows] = xp.where(xp.isfinite(best), idx, -1)
+    return out_t, out_idx
+
 # ============================================================================
 # Audio Source and Microphone
 # ============================================================================
 
-@dataclass
+@dataclass(frozen=True, slots=True, eq=False)  # Array field: hash/compare by identity
 class AudioSource:
     """Audio source in 3D space"""
     position: Vector3
@@ -289,7 +425,11 @@ class AudioSource:
     sample_rate: int
     name: str = "Source"
     
-@dataclass
+    def __post_init__(self):
+        # Contiguous float32 so FFT and accumulation kernels never copy or cast it again
+        object.__setattr__(self, 'audio_data', np.ascontiguousarray(self.audio_data, dtype=np.float32))
+
+@dataclass(frozen=True, slots=True)
 class Microphone:
     """Microphone in 3D space"""
     position: Vector3
@@ -300,7 +440,7 @@ class Microphone:
 # Reflection and Ray Tracing
 # ============================================================================
 
-@dataclass
+@dataclass(frozen=True, slots=True, eq=False)  # Array field: hash/compare by identity
 class Reflection:
     """Single reflection event"""
     path_length: float
@@ -310,95 +450,123 @@ class Reflection:
     delay_samples: int
     triangle: Triangle
 
+@dataclass
+class ReflectionBatch:
+    """All reflections of one source-mic pair, stored column-wise (one row per path)"""
+    path_length: np.ndarray  # (R,) metres
+    attenuation: np.ndarray  # (R, 6) frequency-dependent
+    mat_idx: np.ndarray  # (R,) MaterialDatabase id of the reflecting surface, -1 if direct
+    is_direct: np.ndarray  # (R,) bool
+    reflection_count: np.ndarray  # (R,) int8 reflection order, 0 for the direct path
+    
+    def __len__(self) -> int:
+        return len(self.path_length)
+
 class RayTracer:
     """Ray tracing for acoustic reflections"""
     
-    def __init__(self, geometry: List[Triangle], medium: MediumProperties, 
-                 max_reflections: int = 10, max_distance: float = 100.0):
+    def __init__(self, geometry: Union[List[Triangle], Geometry], medium: MediumProperties, 
+                 max_reflections: int = 10, max_distance: float = 100.0,
+                 energy_threshold: float = 1e-5):
+        if not isinstance(geometry, Geometry):
+            geometry = Geometry.from_triangles(geometry)
         self.geometry = geometry
         self.medium = medium
         self.max_reflections = max_reflections
         self.max_distance = max_distance
+        self.energy_threshold = energy_threshold  # Drop paths with mean attenuation below this
+        
+        # Per-path columns: row 0 is the direct path, rows 1..N the triangles
+        self._path_coeff = np.vstack([
+            np.ones(len(FREQ_BANDS), dtype=np.float32),
+            MaterialDatabase.REFL_TABLE[geometry.mat_idx]
+        ])
+        self._path_mat_idx = np.concatenate([[-1], geometry.mat_idx]).astype(np.int32)
+        self._path_is_direct = np.zeros(len(geometry) + 1, dtype=bool)
+        self._path_is_direct[0] = True
+        self._path_order = (~self._path_is_direct).astype(np.int8)  # First-order paths only
     
-    def trace_path(self, source: Vector3, mic: Vector3) -> List[Reflection]:
+    def trace_path(self, source: Vector3, mic: Vector3) -> ReflectionBatch:
         """Trace all significant paths from source to mic"""
-        reflections = []
+        src = np.asarray(source, dtype=np.float32)
+        mc = np.asarray(mic, dtype=np.float32)
         
-        # Direct path
-        direct_dist = (mic - source).length()
-        if direct_dist <= self.max_distance:
-            direct_atten = self._calculate_attenuation(direct_dist, np.ones(6))
-            reflections.append(Reflection(
-                path_length=direct_dist,
-                reflection_point=source,
-                reflection_count=0,
-                attenuation=direct_atten,
-                delay_samples=0,
-                triangle=None
-            ))
+        # Direct path followed by first-order reflections off every triangle
+        ref_points = self._find_reflection_points(src, mc)
+        path_lens = np.empty(len(self.geometry) + 1, dtype=np.float32)
+        path_lens[0] = np.linalg.norm(mc - src)
+        path_lens[1:] = (np.linalg.norm(ref_points - src, axis=1) +
+                         np.linalg.norm(mc - ref_points, axis=1))
         
-        # First-order reflections
-        for tri in self.geometry:
-            ref_point = self._find_reflection_point(source, mic, tri)
-            if ref_point:
-                path_len = (ref_point - source).length() + (mic - ref_point).length()
-                if path_len <= self.max_distance:
-                    mat = MaterialDatabase.get_material(tri.material)
-                    atten = self._calculate_attenuation(path_len, mat.reflection_coeff)
-                    reflections.append(Reflection(
-                        path_length=path_len,
-                        reflection_point=ref_point,
-                        reflection_count=1,
-                        attenuation=atten,
-                        delay_samples=0,
-                        triangle=tri
-                    ))
+        keep = np.flatnonzero(path_lens <= self.max_distance)
+        attens = self._calculate_attenuation(path_lens[keep], self._path_coeff[keep])
         
-        return reflections
-    
-    def _find_reflection_point(self, source: Vector3, mic: Vector3, 
-                               tri: Triangle) -> Optional[Vector3]:
-        """Find reflection point on triangle (simplified)"""
-        # Mirror source across plane
-        normal = tri.normal()
-        d = normal.dot(tri.v0 - source)
-        mirror = source + normal * (2 * d)
+        # Skip inaudible paths before any IR work is done for them
+        audible = attens.mean(axis=1) > self.energy_threshold
+        keep = keep[audible]
+        return ReflectionBatch(
+            path_length=path_lens[keep],
+            attenuation=attens[audible],
+            mat_idx=self._path_mat_idx[keep],
+            is_direct=self._path_is_direct[keep],
+            reflection_count=self._path_order[keep]
+        )
+    
+    def _find_reflection_points(self, source: np.ndarray, mic: np.ndarray) -> np.ndarray:
+        """Find reflection points on all triangles at once (simplified)"""
+        # Image-source points would mirror source across each plane and
+        # intersect mirror -> mic with the triangle; until then use centroids
+        return self.geometry.centers
+    
+    def _calculate_attenuation(self, distance, reflection_coeff: np.ndarray) -> np.ndarray:
+        """Calculate frequency-dependent attenuation
         
-        # Check if line from mirror to mic intersects triangle
-        return tri.center()  # Simplified: use centroid
-    
-    def _calculate_attenuation(self, distance: float, 
-                               reflection_coeff: np.ndarray) -> np.ndarray:
-        """Calculate frequency-dependent attenuation"""
-        # Distance attenuation (inverse square law)
-        dist_atten = 1.0 / max(distance, 0.1)
+        Accepts a scalar distance with a (6,) coefficient array, or (N,)
+        distances with (N, 6) coefficients.
+        """
+        distance = np.asarray(distance, dtype=np.float32)
+        neg_alpha_k = -self.medium.attenuation_coeff * _FREQS_K
         
-        # Air absorption (frequency dependent)
-        freqs = np.array([125, 250, 500, 1000, 2000, 4000])
-        air_atten = np.exp(-self.medium.attenuation_coeff * distance * freqs / 1000.0)
+        # Air absorption (frequency dependent), computed in place
+        atten = np.multiply.outer(distance, neg_alpha_k)
+        np.exp(atten, out=atten)
         
-        return reflection_coeff * dist_atten * air_atten
+        # Distance attenuation (inverse square law) and surface reflection
+        atten *= (1.0 / np.maximum(distance, 0.1))[..., None]
+        atten *= reflection_coeff
+        return atten
 
 # ============================================================================
 # Export Database to JSON
 # ============================================================================
 
+def _coeffs_to_json(obj):
+    """json.dump fallback for ndarrays: shortest float32 repr, e.g. 0.15 not 0.15000000596"""
+    if isinstance(obj, np.ndarray):
+        return [float(str(x)) for x in obj]
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
 def export_material_database(filename: str = "materials.json"):
     """Export material database to JSON"""
     data = {}
     for name, mat in MaterialDatabase.MATERIALS.items():
         data[name] = {
             'name': mat.name,
-            'absorption_coeff': mat.absorption_coeff.tolist(),
-            'reflection_coeff': mat.reflection_coeff.tolist(),
+            'absorption_coeff': mat.absorption_coeff,
+            'reflection_coeff': mat.reflection_coeff,
             'diffusion_coeff': mat.diffusion_coeff,
             'density': mat.density,
             'speed_of_sound': mat.speed_of_sound,
             'impedance': mat.impedance
         }
     
-    with open(filename, 'w') as f:
-        json.dump(data, f, indent=2)
+    if HAS_ORJSON:
+        # Serializes the coefficient arrays straight from their buffers
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_INDENT_2))
+    else:
+        with open(filename, 'w') as f:
+            json.dump(data, f, indent=2, default=_coeffs_to_json)
     
     print(f"Material database exported to {filename}")
 
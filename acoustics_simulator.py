@@ -3,104 +3,205 @@ Acoustics Simulation Engine
 Main simulation engine with reverb processing and FX chain support
 """
 
+import functools
+import itertools
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import numpy as np
 from scipy import signal
-from typing import List, Callable, Optional, Tuple
+from scipy.fft import rfft, irfft, next_fast_len
+from typing import List, Callable, Optional, Tuple, Union
 from dataclasses import dataclass
 
 from acoustics_core import (
-    Vector3, Triangle, AudioSource, Microphone, 
-    RayTracer, Reflection, MediumDatabase, MaterialDatabase
+    Vector3, Triangle, Geometry, AudioSource, Microphone, 
+    RayTracer, ReflectionBatch, MediumDatabase, MaterialDatabase, FREQ_BANDS
 )
 
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+# ============================================================================
+# Filter Design
+# ============================================================================
+
+@functools.lru_cache(maxsize=256)
+def _design_butter(order: int, cutoff: Tuple[float, ...], btype: str, fs: float) -> np.ndarray:
+    """Butterworth design in SOS form, cached since coefficients only depend on the arguments"""
+    return signal.butter(order, list(cutoff) if len(cutoff) > 1 else cutoff[0],
+                         btype, fs=fs, output='sos')
+
+# ============================================================================
+# Impulse Response Accumulation Kernels
+# ============================================================================
+
+def _pulse_indices(delays: np.ndarray, pulse_len: int, num_samples: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Flat sample index of every pulse tap, plus the mask of taps inside the buffer"""
+    idx = delays[:, None] + np.arange(pulse_len)
+    return idx, idx < num_samples
+
+def _accumulate_ir_numpy(delays: np.ndarray, amps: np.ndarray, decays: np.ndarray,
+                         pulse_env: np.ndarray, ir: np.ndarray) -> None:
+    """Add one decaying pulse per reflection into ir (in place)"""
+    idx, inside = _pulse_indices(delays, len(pulse_env), len(ir))
+    weights = (amps * decays)[:, None] * pulse_env
+    ir += np.bincount(idx[inside], weights=weights[inside], minlength=len(ir))[:len(ir)]
+
+def _accumulate_ir_bands_numpy(delays: np.ndarray, amps: np.ndarray,
+                               pulse_env: np.ndarray, ir_bands: np.ndarray) -> None:
+    """Per-band variant: amps is (R, B), ir_bands is (B, num_samples)"""
+    num_samples = ir_bands.shape[1]
+    idx, inside = _pulse_indices(delays, len(pulse_env), num_samples)
+    flat_idx = idx[inside]
+    for b in range(ir_bands.shape[0]):
+        weights = amps[:, b, None] * pulse_env
+        ir_bands[b] += np.bincount(flat_idx, weights=weights[inside], minlength=num_samples)[:num_samples]
+
+if HAS_NUMBA:
+    @njit(cache=True, fastmath=True, nogil=True)
+    def _accumulate_ir(delays, amps, decays, pulse_env, ir):
+        num_samples = ir.shape[0]
+        for k in range(delays.shape[0]):
+            d = delays[k]
+            pulse_len = min(pulse_env.shape[0], num_samples - d)
+            if pulse_len <= 0:
+                continue
+            a = amps[k] * decays[k]
+            for j in range(pulse_len):
+                ir[d + j] += a * pulse_env[j]
+    
+    @njit(cache=True, fastmath=True, nogil=True)
+    def _accumulate_ir_bands(delays, amps, pulse_env, ir_bands):
+        num_samples = ir_bands.shape[1]
+        for k in range(delays.shape[0]):
+            d = delays[k]
+            pulse_len = min(pulse_env.shape[0], num_samples - d)
+            if pulse_len <= 0:
+                continue
+            for b in range(ir_bands.shape[0]):
+                a = amps[k, b]
+                for j in range(pulse_len):
+                    ir_bands[b, d + j] += a * pulse_env[j]
+else:
+    _accumulate_ir = _accumulate_ir_numpy
+    _accumulate_ir_bands = _accumulate_ir_bands_numpy
+
 # ============================================================================
 # Impulse Response Generator
 # ============================================================================
 
+# Length of the truncated filterbank impulse responses, long enough for the
+# band filters' ringing to decay to ~1e-12 of its energy at 44.1 kHz
+_FILTERBANK_TAPS = 4096
+
+def _trim_trailing_zeros(ir: np.ndarray) -> np.ndarray:
+    """View of ir up to and including its last nonzero sample"""
+    nonzero = np.flatnonzero(ir)
+    return ir[:nonzero[-1] + 1] if len(nonzero) else ir[:1]
+
+def _positions(items: List[Union[AudioSource, Microphone]]) -> np.ndarray:
+    """Positions of sources or mics as one (K, 3) float32 array"""
+    return np.array([item.position for item in items], dtype=np.float32).reshape(-1, 3)
+
 class ImpulseResponseGenerator:
     """Generate impulse responses from reflection data"""
     
     def __init__(self, sample_rate: int, medium_speed: float = 343.0):
         self.sample_rate = sample_rate
         self.medium_speed = medium_speed
+        
+        # Decay envelope shared by every reflection pulse (max 64 samples)
+        self._pulse_env = np.exp(-np.arange(64) / (sample_rate * 0.01)).astype(np.float32)
+        
+        # Filterbank used by generate_frequency_dependent_ir
+        self._band_sos = []
+        for i, freq in enumerate(FREQ_BANDS):
+            if i == 0:
+                # Lowpass for first band
+                sos = _design_butter(4, (freq * 1.5,), 'low', sample_rate)
+            elif i == len(FREQ_BANDS) - 1:
+                # Highpass for last band
+                sos = _design_butter(4, (freq * 0.67,), 'high', sample_rate)
+            else:
+                # Bandpass for middle bands
+                low = freq * 0.67
+                high = freq * 1.5
+                sos = _design_butter(4, (low, high), 'band', sample_rate)
+            self._band_sos.append(sos)
+        
+        # Band impulse responses, shape (B, taps), applied as FIR filters via FFT
+        impulse = signal.unit_impulse(_FILTERBANK_TAPS)
+        self._band_h = np.stack([signal.sosfilt(sos, impulse) for sos in self._band_sos])
+        self._band_responses = {}  # nfft -> (B, nfft//2+1) complex response
+    
+    def _delay_samples(self, reflections: ReflectionBatch) -> np.ndarray:
+        """Arrival time of each reflection in samples"""
+        return (reflections.path_length / self.medium_speed * self.sample_rate).astype(np.int64)
     
-    def generate_ir(self, reflections: List[Reflection], 
+    def generate_ir(self, reflections: ReflectionBatch, 
                     duration_sec: float = 2.0) -> np.ndarray:
         """Generate impulse response from reflections"""
         num_samples = int(duration_sec * self.sample_rate)
-        ir = np.zeros(num_samples)
+        ir = np.zeros(num_samples, dtype=np.float32)
+        if not len(reflections):
+            return ir
         
-        for refl in reflections:
-            # Calculate delay in samples
-            delay_sec = refl.path_length / self.medium_speed
-            delay_samples = int(delay_sec * self.sample_rate)
-            
-            if delay_samples < num_samples:
-                # Use average attenuation across frequency bands
-                amplitude = np.mean(refl.attenuation)
-                
-                # Add impulse with exponential decay for diffuse reflections
-                if refl.triangle:
-                    mat = MaterialDatabase.get_material(refl.triangle.material)
-                    decay = 1.0 - mat.diffusion_coeff * 0.3
-                else:
-                    decay = 1.0
-                
-                # Create short pulse with decay
-                pulse_len = min(64, num_samples - delay_samples)
-                pulse = amplitude * np.exp(-np.arange(pulse_len) / (self.sample_rate * 0.01))
-                pulse *= decay
-                
-                ir[delay_samples:delay_samples + pulse_len] += pulse
+        delays = self._delay_samples(reflections)
+        
+        # Use average attenuation across frequency bands
+        amps = reflections.attenuation.mean(axis=1)
+        
+        # Exponential decay for diffuse reflections
+        decays = np.where(
+            reflections.is_direct, 1.0,
+            1.0 - MaterialDatabase.DIFF_TABLE[reflections.mat_idx] * 0.3
+        )
+        
+        # Add short pulse with decay per reflection
+        _accumulate_ir(delays, amps, decays, self._pulse_env, ir)
         
         return ir
     
-    def generate_frequency_dependent_ir(self, reflections: List[Reflection],
+    def generate_frequency_dependent_ir(self, reflections: ReflectionBatch,
                                        duration_sec: float = 2.0) -> np.ndarray:
         """Generate frequency-dependent impulse response using filterbank"""
         num_samples = int(duration_sec * self.sample_rate)
         
         # Frequency bands (Hz)
-        bands = np.array([125, 250, 500, 1000, 2000, 4000])
+        bands = FREQ_BANDS
+        
+        ir_combined = np.zeros(num_samples, dtype=np.float32)
+        if not len(reflections):
+            return ir_combined
+        
+        # Only the span up to the last pulse carries energy; filter just that
+        delays = self._delay_samples(reflections)
+        active = int(min(num_samples, max(0, delays.max()) + len(self._pulse_env)))
         
         # Create filterbank
-        irs_per_band = []
-        for i, freq in enumerate(bands):
-            ir_band = np.zeros(num_samples)
-            
-            for refl in reflections:
-                delay_sec = refl.path_length / self.medium_speed
-                delay_samples = int(delay_sec * self.sample_rate)
-                
-                if delay_samples < num_samples:
-                    amplitude = refl.attenuation[i]
-                    pulse_len = min(64, num_samples - delay_samples)
-                    pulse = amplitude * np.exp(-np.arange(pulse_len) / (self.sample_rate * 0.01))
-                    ir_band[delay_samples:delay_samples + pulse_len] += pulse
-            
-            irs_per_band.append(ir_band)
+        irs_per_band = np.zeros((len(bands), active), dtype=np.float32)
+        amps = np.ascontiguousarray(reflections.attenuation)
+        _accumulate_ir_bands(delays, amps, self._pulse_env, irs_per_band)
         
-        # Combine bands using bandpass filters
-        ir_combined = np.zeros(num_samples)
-        for i, (ir_band, freq) in enumerate(zip(irs_per_band, bands)):
-            # Design bandpass filter
-            if i == 0:
-                # Lowpass for first band
-                sos = signal.butter(4, freq * 1.5, 'low', fs=self.sample_rate, output='sos')
-            elif i == len(bands) - 1:
-                # Highpass for last band
-                sos = signal.butter(4, freq * 0.67, 'high', fs=self.sample_rate, output='sos')
-            else:
-                # Bandpass for middle bands
-                low = freq * 0.67
-                high = freq * 1.5
-                sos = signal.butter(4, [low, high], 'band', fs=self.sample_rate, output='sos')
-            
-            # Filter and add
-            ir_filtered = signal.sosfilt(sos, ir_band)
-            ir_combined += ir_filtered
+        # Combine bands using bandpass filters, applied as one FFT-domain multiply
+        tail = min(num_samples, active + _FILTERBANK_TAPS - 1)
+        nfft = next_fast_len(active + _FILTERBANK_TAPS - 1)
+        spectrum = rfft(irs_per_band, n=nfft, axis=1)
+        spectrum *= self._band_response(nfft)
+        ir_combined[:tail] = irfft(spectrum.sum(axis=0), n=nfft)[:tail]
         
         return ir_combined
+    
+    def _band_response(self, nfft: int) -> np.ndarray:
+        """Filterbank frequency responses on the rfft grid of size nfft, shape (B, nfft//2+1)"""
+        if nfft not in self._band_responses:
+            self._band_responses[nfft] = rfft(self._band_h, n=nfft, axis=1).astype(np.complex64)
+        return self._band_responses[nfft]
 
 # ============================================================================
 # FX Chain Processor
@@ -118,10 +219,7 @@ class FXChain:
     
     def process(self, audio: np.ndarray) -> np.ndarray:
         """Process audio through effect chain"""
-        output = audio.copy()
-        for proc in self.processors:
-            output = proc(output)
-        return output
+        return functools.reduce(lambda buf, proc: proc(buf), self.processors, audio.copy())
     
     def clear(self):
         """Clear all processors"""
@@ -134,17 +232,17 @@ class FXProcessors:
     @staticmethod
     def lowpass_filter(cutoff_hz: float, sample_rate: int):
         """Create lowpass filter processor"""
+        sos = _design_butter(4, (cutoff_hz,), 'low', sample_rate)
         def process(audio: np.ndarray) -> np.ndarray:
-            sos = signal.butter(4, cutoff_hz, 'low', fs=sample_rate, output='sos')
-            return signal.sosfilt(sos, audio)
+            return signal.sosfilt(sos, audio).astype(audio.dtype, copy=False)
         return process
     
     @staticmethod
     def highpass_filter(cutoff_hz: float, sample_rate: int):
         """Create highpass filter processor"""
+        sos = _design_butter(4, (cutoff_hz,), 'high', sample_rate)
         def process(audio: np.ndarray) -> np.ndarray:
-            sos = signal.butter(4, cutoff_hz, 'high', fs=sample_rate, output='sos')
-            return signal.sosfilt(sos, audio)
+            return signal.sosfilt(sos, audio).astype(audio.dtype, copy=False)
         return process
     
     @staticmethod
@@ -167,26 +265,41 @@ class FXProcessors:
             
             # LFO for delay modulation
             lfo = np.sin(2 * np.pi * rate_hz * t)
-            delay_samples = (depth * sample_rate * lfo).astype(int)
+            delay_samples = depth * sample_rate * lfo
             
-            output = audio.copy()
-            for i in range(num_samples):
-                delayed_idx = i - delay_samples[i]
-                if 0 <= delayed_idx < num_samples:
-                    output[i] = 0.7 * audio[i] + 0.3 * audio[delayed_idx]
+            # Fractional-delay read of all positions at once
+            n = np.arange(num_samples)
+            delayed_pos = n - delay_samples
+            valid = (delayed_pos >= 0) & (delayed_pos <= num_samples - 1)
+            delayed = np.interp(delayed_pos, n, audio)
             
-            return output
+            return np.where(valid, 0.7 * audio + 0.3 * delayed, audio).astype(audio.dtype, copy=False)
         return process
 
 # ============================================================================
 # Acoustic Simulator
 # ============================================================================
 
+def _mix_mic(irs: List[np.ndarray], src_ffts: List[np.ndarray], src_lens: List[int],
+             nfft: int, out_len: int) -> np.ndarray:
+    """Sum every source convolved with its IR into one mic (module level so workers can pickle it)"""
+    mic_output = np.zeros(out_len, dtype=np.float32)
+    for ir, src_fft, src_len in zip(irs, src_ffts, src_lens):
+        # Convolve source audio with impulse response (spectrum product in place)
+        conv_len = src_len + len(ir) - 1
+        spectrum = rfft(ir, n=nfft)
+        spectrum *= src_fft
+        convolved = irfft(spectrum, n=nfft, overwrite_x=True)[:conv_len]
+        np.add(mic_output[:conv_len], convolved, out=mic_output[:conv_len])
+    return mic_output
+
 class AcousticSimulator:
     """Main acoustic simulation engine"""
     
-    def __init__(self, geometry: List[Triangle], medium: str = 'air',
+    def __init__(self, geometry: Union[List[Triangle], Geometry], medium: str = 'air',
                  sample_rate: int = 44100):
+        if not isinstance(geometry, Geometry):
+            geometry = Geometry.from_triangles(geometry)
         self.geometry = geometry
         self.medium = MediumDatabase.get_medium(medium)
         self.sample_rate = sample_rate
@@ -198,6 +311,8 @@ class AcousticSimulator:
         self.max_reflections = 5
         self.max_distance = 100.0
         self.use_frequency_dependent = True
+        self.num_workers = os.cpu_count() or 1  # Workers used by simulate()
+        self.use_processes = False  # Mix each mic in a worker process instead of a thread
         
         # Initialize ray tracer
         self.ray_tracer = RayTracer(
@@ -213,6 +328,14 @@ class AcousticSimulator:
             self.medium.speed_of_sound
         )
     
+    def set_medium(self, medium: str):
+        """Switch propagation medium, keeping geometry and filterbank setup"""
+        self.medium = MediumDatabase.get_medium(medium)
+        
+        # Only air absorption and arrival times depend on the medium
+        self.ray_tracer.medium = self.medium
+        self.ir_gen.medium_speed = self.medium.speed_of_sound
+    
     def add_source(self, source: AudioSource):
         """Add audio source"""
         self.sources.append(source)
@@ -227,48 +350,67 @@ class AcousticSimulator:
     
     def simulate(self) -> List[np.ndarray]:
         """Simulate acoustics for all microphones"""
-        outputs = []
+        # (K, 3) float32 positions, rebuilt from the public lists so they can never drift
+        src_positions = _positions(self.sources)
+        mic_positions = _positions(self.microphones)
         
-        for mic in self.microphones:
-            mic_output = np.zeros(
-                max(src.audio_data.shape[0] for src in self.sources) + 
-                int(2.0 * self.sample_rate)  # Add 2 sec for reverb tail
-            )
-            
-            for source in self.sources:
-                # Trace paths from source to mic
-                reflections = self.ray_tracer.trace_path(
-                    source.position,
-                    mic.position
-                )
-                
-                # Generate impulse response
-                if self.use_frequency_dependent:
-                    ir = self.ir_gen.generate_frequency_dependent_ir(reflections)
-                else:
-                    ir = self.ir_gen.generate_ir(reflections)
-                
-                # Apply FX chain to IR if enabled
-                if self.fx_chain:
-                    ir = self.fx_chain.process(ir)
-                
-                # Convolve source audio with impulse response
-                convolved = signal.fftconvolve(source.audio_data, ir, mode='full')
-                
-                # Mix into mic output
-                mic_output[:len(convolved)] += convolved
+        src_lens = [src.audio_data.shape[0] for src in self.sources]
+        out_len = max(src_lens) + int(2.0 * self.sample_rate)  # Add 2 sec for reverb tail
+        num_sources = len(self.sources)
+        workers = max(1, self.num_workers)
+        
+        # (mic, source) pairs are independent; the FFTs and JIT kernels release the GIL
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Impulse response for every (mic, source) pair, silent tail dropped
+            # so the convolution FFTs only cover the reverb
+            pairs = itertools.product(mic_positions, src_positions)
+            irs = list(pool.map(lambda pair: _trim_trailing_zeros(self._pair_ir(pair[1], pair[0])),
+                                pairs))
             
+            # One transform size for every pair, so each source is transformed once
+            nfft = next_fast_len(max(src_lens) + max(map(len, irs), default=0) - 1)
+            src_ffts = list(pool.map(lambda src: rfft(src.audio_data, n=nfft), self.sources))
+        
+        # Mics are independent; threads by default, processes sidestep the GIL
+        if self.use_processes:
+            # Spawn, not fork: forking a process with live worker threads can deadlock the child
+            executor = ProcessPoolExecutor(max_workers=max(1, min(len(self.microphones), workers)),
+                                           mp_context=multiprocessing.get_context('spawn'))
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+        mix = functools.partial(_mix_mic, src_ffts=src_ffts, src_lens=src_lens,
+                                nfft=nfft, out_len=out_len)
+        mic_irs = [irs[m * num_sources:(m + 1) * num_sources] for m in range(len(mic_positions))]
+        with executor as pool:
+            outputs = list(pool.map(mix, mic_irs))
+        
+        for mic_output in outputs:
             # Normalize
             max_val = np.max(np.abs(mic_output))
             if max_val > 0:
-                mic_output = mic_output / max_val * 0.9
-            
-            outputs.append(mic_output)
+                mic_output *= 0.9 / max_val
         
         return outputs
     
+    def _pair_ir(self, src_pos: np.ndarray, mic_pos: np.ndarray) -> np.ndarray:
+        """Impulse response (including FX chain) from one source position to one mic position"""
+        # Trace paths from source to mic
+        reflections = self.ray_tracer.trace_path(src_pos, mic_pos)
+        
+        # Generate impulse response
+        if self.use_frequency_dependent:
+            ir = self.ir_gen.generate_frequency_dependent_ir(reflections)
+        else:
+            ir = self.ir_gen.generate_ir(reflections)
+        
+        # Apply FX chain to IR if enabled
+        if self.fx_chain:
+            ir = self.fx_chain.process(ir)
+        
+        return ir
+    
     def get_room_response(self, source_pos: Vector3, mic_pos: Vector3,
-                         duration: float = 2.0) -> Tuple[np.ndarray, List[Reflection]]:
+                         duration: float = 2.0) -> Tuple[np.ndarray, ReflectionBatch]:
         """Get impulse response and reflection data for a source-mic pair"""
         reflections = self.ray_tracer.trace_path(source_pos, mic_pos)
         
@@ -283,40 +425,38 @@ class AcousticSimulator:
 # Geometry Loaders
 # ============================================================================
 
+# Leading indentation is allowed, as with the old strip()-based parser
+_OBJ_VERTEX_RE = re.compile(rb'^[ \t]*v[ \t]+(\S+[ \t]+\S+[ \t]+\S+)', re.M)
+_OBJ_FACE_RE = re.compile(rb'^[ \t]*f[ \t]+(-?\d+)\S*[ \t]+(-?\d+)\S*[ \t]+(-?\d+)', re.M)
+
 class GeometryLoader:
     """Load 3D geometry from various formats"""
     
     @staticmethod
-    def load_obj(filename: str, default_material: str = 'concrete') -> List[Triangle]:
+    def load_obj(filename: str, default_material: str = 'concrete') -> Geometry:
         """Load geometry from OBJ file"""
-        vertices = []
-        triangles = []
-        
-        with open(filename, 'r') as f:
-            for line in f:
-                parts = line.strip().split()
-                if not parts:
-                    continue
-                
-                if parts[0] == 'v':
-                    # Vertex
-                    x, y, z = map(float, parts[1:4])
-                    vertices.append(Vector3(x, y, z))
-                
-                elif parts[0] == 'f':
-                    # Face (assuming triangles)
-                    indices = [int(p.split('/')[0]) - 1 for p in parts[1:4]]
-                    triangles.append(Triangle(
-                        vertices[indices[0]],
-                        vertices[indices[1]],
-                        vertices[indices[2]],
-                        default_material
-                    ))
-        
-        return triangles
+        with open(filename, 'rb') as f:
+            data = f.read()
+        
+        # Vertices: 'v x y z', parsed in a single pass over the whole file
+        vertex_fields = _OBJ_VERTEX_RE.findall(data)
+        vertices = np.fromstring(b' '.join(vertex_fields), dtype=np.float32,
+                                 sep=' ').reshape(-1, 3)
+        
+        # Faces (assuming triangles): first index of each 'v/vt/vn' corner
+        face_fields = _OBJ_FACE_RE.findall(data)
+        faces = np.fromstring(b' '.join(itertools.chain.from_iterable(face_fields)),
+                              dtype=np.int64, sep=' ').reshape(-1, 3) - 1
+        
+        return Geometry(
+            vertices[faces[:, 0]],
+            vertices[faces[:, 1]],
+            vertices[faces[:, 2]],
+            np.full(len(faces), MaterialDatabase.material_id(default_material), dtype=np.int32)
+        )
     
     @staticmethod
-    def create_box(size: Vector3, material: str = 'concrete') -> List[Triangle]:
+    def create_box(size: Vector3, material: str = 'concrete') -> Geometry:
         """Create box geometry"""
         x, y, z = size.x / 2, size.y / 2, size.z / 2
         
@@ -344,7 +484,7 @@ class GeometryLoader:
             Triangle(v[0], v[4], v[5], material), Triangle(v[0], v[5], v[1], material),
         ]
         
-        return triangles
+        return Geometry.from_triangles(triangles)
 
 # Example usage
 if __name__ == "__main__":
@@ -3,20 +3,55 @@ Complete Usage Examples for Acoustics Simulation Library
 Demonstrates all major features including 3D geometry, materials, and FX chains
 """
 
+import functools
+import sys
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # Examples only write PNGs; skip the interactive GUI backends
 import matplotlib.pyplot as plt
 from scipy.io import wavfile
+from scipy.fft import rfft, rfftfreq, next_fast_len
+
+plt.rcParams['figure.dpi'] = 80
+plt.rcParams['savefig.dpi'] = 80
 
 # Import our library modules
 from acoustics_core import (
     Vector3, Triangle, AudioSource, Microphone,
-    MaterialDatabase, MediumDatabase, GeometryLoader
+    MaterialDatabase
 )
 from acoustics_simulator import (
     AcousticSimulator, FXChain, FXProcessors,
-    ImpulseResponseGenerator
+    ImpulseResponseGenerator, GeometryLoader
 )
 
+# ============================================================================
+# Test Signal Helpers
+# ============================================================================
+
+DTYPE = np.float32  # Sample type for every signal built here, matching the simulator
+
+@functools.lru_cache(maxsize=8)
+def _time_base(sample_rate: int, duration: float) -> np.ndarray:
+    """Sample times for a signal of the given duration, shared read-only across examples"""
+    t = np.arange(int(sample_rate * duration), dtype=DTYPE) / DTYPE(sample_rate)
+    t.setflags(write=False)
+    return t
+
+def _sine(freq: float, amplitude: float, t: np.ndarray) -> np.ndarray:
+    """amplitude * sin(2*pi*freq*t) computed into a single buffer"""
+    out = np.empty_like(t)
+    np.multiply(DTYPE(2 * np.pi * freq), t, out=out)
+    np.sin(out, out=out)
+    out *= DTYPE(amplitude)
+    return out
+
+def _to_int16(x: np.ndarray, in_place: bool = False) -> np.ndarray:
+    """Peak-normalize to full int16 scale in one scaling pass (in_place scales x itself)"""
+    peak = max(-x.min(), x.max())  # max |x| without allocating np.abs(x)
+    scale = DTYPE(32767.0 / peak) if peak > 0 else DTYPE(0.0)
+    return np.multiply(x, scale, out=x if in_place else None, dtype=DTYPE).astype(np.int16)
+
 # ============================================================================
 # Example 1: Simple Room Simulation
 # ============================================================================
@@ -38,8 +73,8 @@ def example_simple_room():
     # Generate test tone (440 Hz sine wave, 1 second)
     duration = 1.0
     sample_rate = 44100
-    t = np.linspace(0, duration, int(sample_rate * duration))
-    test_signal = 0.5 * np.sin(2 * np.pi * 440 * t)
+    t = _time_base(sample_rate, duration)
+    test_signal = _sine(440, 0.5, t)
     
     # Add source
     source = AudioSource(
@@ -62,12 +97,7 @@ def example_simple_room():
     print(f"✓ Output length: {len(outputs[0])} samples "
           f"({len(outputs[0])/sample_rate:.2f} seconds)")
     
-    # Save output
-    output_normalized = np.int16(outputs[0] / np.max(np.abs(outputs[0])) * 32767)
-    wavfile.write('output_simple_room.wav', sample_rate, output_normalized)
-    print("✓ Saved to output_simple_room.wav")
-    
-    return outputs[0], sample_rate
+    return {'name': 'simple_room', 'sr': sample_rate, 'audio': outputs[0]}
 
 # ============================================================================
 # Example 2: Multi-Source Stereo Recording
@@ -88,10 +118,10 @@ def example_stereo_recording():
     
     sample_rate = 44100
     duration = 2.0
-    t = np.linspace(0, duration, int(sample_rate * duration))
+    t = _time_base(sample_rate, duration)
     
     # Source 1: Low frequency (100 Hz)
-    signal1 = 0.3 * np.sin(2 * np.pi * 100 * t)
+    signal1 = _sine(100, 0.3, t)
     source1 = AudioSource(
         position=Vector3(-5, 0, 1.5),
         audio_data=signal1,
@@ -101,7 +131,7 @@ def example_stereo_recording():
     sim.add_source(source1)
     
     # Source 2: Mid frequency (440 Hz)
-    signal2 = 0.3 * np.sin(2 * np.pi * 440 * t)
+    signal2 = _sine(440, 0.3, t)
     source2 = AudioSource(
         position=Vector3(5, 0, 1.5),
         audio_data=signal2,
@@ -111,7 +141,7 @@ def example_stereo_recording():
     sim.add_source(source2)
     
     # Source 3: High frequency (1000 Hz)
-    signal3 = 0.2 * np.sin(2 * np.pi * 1000 * t)
+    signal3 = _sine(1000, 0.2, t)
     source3 = AudioSource(
         position=Vector3(0, 3, 1.5),
         audio_data=signal3,
@@ -134,13 +164,11 @@ def example_stereo_recording():
     print(f"✓ Left channel: {len(outputs[0])} samples")
     print(f"✓ Right channel: {len(outputs[1])} samples")
     
-    # Save stereo output
-    stereo_output = np.column_stack([outputs[0], outputs[1]])
-    stereo_normalized = np.int16(stereo_output / np.max(np.abs(stereo_output)) * 32767)
-    wavfile.write('output_stereo.wav', sample_rate, stereo_normalized)
-    print("✓ Saved to output_stereo.wav")
+    # Interleave into one (N, 2) buffer for the stereo WAV
+    stereo_output = np.empty((len(outputs[0]), 2), dtype=DTYPE)
+    np.stack(outputs[:2], axis=1, out=stereo_output)
     
-    return outputs
+    return {'name': 'stereo', 'sr': sample_rate, 'audio': stereo_output}
 
 # ============================================================================
 # Example 3: FX Chain on Reflections
@@ -167,7 +195,7 @@ def example_fx_chain():
     sim.set_fx_chain(fx)
     
     # Generate impulse
-    impulse = np.zeros(44100)
+    impulse = np.zeros(44100, dtype=DTYPE)
     impulse[0] = 1.0
     
     source = AudioSource(
@@ -186,12 +214,7 @@ def example_fx_chain():
     
     print(f"✓ Generated impulse response with FX: {len(outputs[0])} samples")
     
-    # Save
-    output_normalized = np.int16(outputs[0] / np.max(np.abs(outputs[0])) * 32767)
-    wavfile.write('output_fx_chain.wav', 44100, output_normalized)
-    print("✓ Saved to output_fx_chain.wav")
-    
-    return outputs[0]
+    return {'name': 'fx_chain', 'sr': 44100, 'audio': outputs[0]}
 
 # ============================================================================
 # Example 4: Different Media Comparison
@@ -211,27 +234,28 @@ def example_media_comparison():
     # Test signal
     sample_rate = 44100
     duration = 0.5
-    t = np.linspace(0, duration, int(sample_rate * duration))
-    test_signal = 0.5 * np.sin(2 * np.pi * 440 * t)
+    t = _time_base(sample_rate, duration)
+    test_signal = _sine(440, 0.5, t)
+    
+    # One simulator for the whole sweep; only the medium changes
+    sim = AcousticSimulator(room, medium=media[0], sample_rate=sample_rate)
+    sim.max_reflections = 5
+    
+    source = AudioSource(
+        position=Vector3(2, 2, 1.5),
+        audio_data=test_signal,
+        sample_rate=sample_rate
+    )
+    sim.add_source(source)
+    
+    mic = Microphone(position=Vector3(8, 6, 1.5))
+    sim.add_microphone(mic)
     
     for medium_name in media:
         print(f"\nSimulating in {medium_name}...")
         
-        medium = MediumDatabase.get_medium(medium_name)
-        print(f"  Speed of sound: {medium.speed_of_sound:.1f} m/s")
-        
-        sim = AcousticSimulator(room, medium=medium_name, sample_rate=sample_rate)
-        sim.max_reflections = 5
-        
-        source = AudioSource(
-            position=Vector3(2, 2, 1.5),
-            audio_data=test_signal,
-            sample_rate=sample_rate
-        )
-        sim.add_source(source)
-        
-        mic = Microphone(position=Vector3(8, 6, 1.5))
-        sim.add_microphone(mic)
+        sim.set_medium(medium_name)
+        print(f"  Speed of sound: {sim.medium.speed_of_sound:.1f} m/s")
         
         outputs = sim.simulate()
         results[medium_name] = outputs[0]
@@ -249,6 +273,7 @@ def example_media_comparison():
     
     plt.tight_layout()
     plt.savefig('media_comparison.png')
+    plt.close(fig)
     print("\n✓ Saved comparison plot to media_comparison.png")
     
     return results
@@ -270,15 +295,18 @@ def example_material_database():
     
     freq_bands = ['125Hz', '250Hz', '500Hz', '1kHz', '2kHz', '4kHz']
     
+    # Build the whole table first and write it in one call
+    lines = []
     for mat_name in sorted(materials):
         mat = MaterialDatabase.get_material(mat_name)
-        print(f"\n{mat.name}:")
-        print(f"  Density: {mat.density:.1f} kg/m³")
-        print(f"  Speed of sound: {mat.speed_of_sound:.1f} m/s")
-        print(f"  Diffusion: {mat.diffusion_coeff:.2f}")
-        print(f"  Absorption coefficients:")
-        for freq, coeff in zip(freq_bands, mat.absorption_coeff):
-            print(f"    {freq:>6s}: {coeff:.3f}")
+        lines.append(f"\n{mat.name}:")
+        lines.append(f"  Density: {mat.density:.1f} kg/m³")
+        lines.append(f"  Speed of sound: {mat.speed_of_sound:.1f} m/s")
+        lines.append(f"  Diffusion: {mat.diffusion_coeff:.2f}")
+        lines.append(f"  Absorption coefficients:")
+        lines.extend(f"    {freq:>6s}: {coeff:.3f}"
+                     for freq, coeff in zip(freq_bands, mat.absorption_coeff))
+    sys.stdout.write("\n".join(lines) + "\n")
     
     # Plot absorption curves
     fig, ax = plt.subplots(figsize=(12, 6))
@@ -297,6 +325,7 @@ def example_material_database():
     
     plt.tight_layout()
     plt.savefig('material_absorption.png')
+    plt.close(fig)
     print("\n✓ Saved absorption plot to material_absorption.png")
 
 # ============================================================================
@@ -326,23 +355,22 @@ def example_room_response():
     
     # Analyze reflections
     print("\nReflection analysis:")
-    print(f"  Direct path: {reflections[0].path_length:.2f} m")
-    print(f"  First reflection: {reflections[1].path_length:.2f} m")
+    print(f"  Direct path: {reflections.path_length[0]:.2f} m")
+    print(f"  First reflection: {reflections.path_length[1]:.2f} m")
     
-    reflection_counts = {}
-    for refl in reflections:
-        count = refl.reflection_count
-        reflection_counts[count] = reflection_counts.get(count, 0) + 1
+    # Orders are small non-negative ints, so a bincount is the whole histogram
+    hist = np.bincount(reflections.reflection_count)
     
     print("\nReflections by order:")
-    for order, count in sorted(reflection_counts.items()):
-        print(f"  Order {order}: {count} reflections")
+    for order, count in enumerate(hist):
+        if count:
+            print(f"  Order {order}: {count} reflections")
     
     # Plot impulse response
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8))
     
     # Time domain
-    time = np.arange(len(ir)) / 44100
+    time = np.arange(len(ir), dtype=DTYPE) / DTYPE(44100)
     ax1.plot(time, ir)
     ax1.set_xlabel('Time (s)')
     ax1.set_ylabel('Amplitude')
@@ -350,8 +378,10 @@ def example_room_response():
     ax1.grid(True, alpha=0.3)
     
     # Frequency domain
-    fft = np.fft.rfft(ir)
-    freqs = np.fft.rfftfreq(len(ir), 1/44100)
+    # Zero-pad to a fast transform size; workers=-1 uses every core
+    nfft = next_fast_len(len(ir), real=True)
+    fft = rfft(ir, n=nfft, workers=-1)
+    freqs = rfftfreq(nfft, 1/44100)
     magnitude_db = 20 * np.log10(np.abs(fft) + 1e-10)
     
     ax2.plot(freqs, magnitude_db)
@@ -364,6 +394,7 @@ def example_room_response():
     
     plt.tight_layout()
     plt.savefig('room_response.png')
+    plt.close(fig)
     print("\n✓ Saved response plots to room_response.png")
     
     return ir
@@ -378,14 +409,23 @@ if __name__ == "__main__":
     print("the library's capabilities.\n")
     
     try:
-        # Run examples
-        example_simple_room()
-        example_stereo_recording()
-        example_fx_chain()
+        # Run examples; recordings come back as raw float audio
+        recordings = [
+            example_simple_room(),
+            example_stereo_recording(),
+            example_fx_chain(),
+        ]
         example_media_comparison()
         example_material_database()
         example_room_response()
         
+        # Normalize and write every recording in one pass
+        print()
+        for rec in recordings:
+            filename = f"output_{rec['name']}.wav"
+            wavfile.write(filename, rec['sr'], _to_int16(rec['audio'], in_place=True))
+            print(f"✓ Saved to {filename}")
+        
         print("\n" + "=" * 60)
         print("All examples completed successfully!")
         print("=" * 60)
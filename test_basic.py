@@ -1,4 +1,6 @@
 # test_basic.py
+import os
+import tempfile
 import numpy as np
 from acoustics_core import MaterialDatabase, Vector3
 from acoustics_simulator import AcousticSimulator, GeometryLoader
@@ -12,13 +14,74 @@ def test_material_database():
     assert len(concrete.absorption_coeff) == 6
     print("✓ Material database test passed")
 
+def test_box_geometry():
+    room = GeometryLoader.create_box(Vector3(10, 8, 6), 'oak')
+    assert len(room) == 12
+    assert room.v0.shape == (12, 3)
+    assert np.allclose(np.linalg.norm(room.normals, axis=1), 1.0)
+    assert np.allclose(room.areas.sum(), 2 * (10 * 8 + 10 * 6 + 8 * 6))
+    
+    tri = room[0]
+    assert tri.material == 'oak'
+    assert np.allclose(tri.center.to_array(), room.centers[0])
+    print("✓ Box geometry test passed")
+
+def test_intersect_rays():
+    from acoustics_core import Geometry, _intersect_rays_xp
+    room = GeometryLoader.create_box(Vector3(10, 8, 6), 'concrete')
+    
+    def cast(origins, dirs, geo=room):
+        return _intersect_rays_xp(np, np.asarray(origins, dtype=np.float32),
+                                  np.asarray(dirs, dtype=np.float32), geo.v0, geo.edge1, geo.edge2)
+    
+    ts, idxs = cast([[0, 0, 0], [20, 0, 0]], [[1, 0, 0], [1, 0, 0]])
+    assert np.isclose(ts[0], 5.0)
+    assert np.allclose(room.centers[idxs[0]][0], 5.0)
+    assert idxs[1] == -1 and np.isinf(ts[1])
+    
+    # Every ray from inside the closed box hits a wall
+    dirs = np.random.default_rng(0).standard_normal((32, 3))
+    ts, idxs = cast(np.zeros((32, 3)), dirs)
+    assert idxs.min() >= 0 and np.isfinite(ts).all()
+    
+    # Misses cleanly on empty geometry
+    empty = Geometry(np.zeros((0, 3)), np.zeros((0, 3)), np.zeros((0, 3)), np.zeros(0))
+    ts, idxs = cast(np.zeros((2, 3)), dirs[:2], empty)
+    assert np.isinf(ts).all() and (idxs == -1).all()
+    print("✓ Ray intersection test passed")
+
+def test_load_obj():
+    obj = "v 0 0 0\nv 1 0 0\nvn 0 0 1\nv 1 1 0\nv 0 1 1.5\nf 1/1/1 2/2/1 3/3/1\nf 1//1 3//1 4//1\n"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'mesh.obj')
+        with open(path, 'w') as f:
+            f.write(obj)
+        mesh = GeometryLoader.load_obj(path, 'glass')
+    
+    assert len(mesh) == 2
+    assert np.allclose(mesh.v2, [[1, 1, 0], [0, 1, 1.5]])
+    assert mesh[1].material == 'glass'
+    
+    # Indented lines parse too, so mixed indentation keeps faces on the right vertices
+    indented = "v 0 0 0\n  v 1 0 0\n\tv 1 1 0\nv 0 1 1.5\n  f 1 2 3\nf 1 3 4\n"
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'indented.obj')
+        with open(path, 'w') as f:
+            f.write(indented)
+        mesh = GeometryLoader.load_obj(path)
+    
+    assert len(mesh) == 2
+    assert np.allclose(mesh.v2, [[1, 1, 0], [0, 1, 1.5]])
+    print("✓ OBJ loader test passed")
+
 def test_simple_simulation():
     room = GeometryLoader.create_box(Vector3(10, 8, 6), 'concrete')
     sim = AcousticSimulator(room, sample_rate=44100)
     
     from acoustics_core import AudioSource, Microphone
     
-    test_signal = np.random.randn(44100)
+    rng = np.random.default_rng(0)
+    test_signal = rng.standard_normal(44100, dtype=np.float32)
     source = AudioSource(
         position=Vector3(2, 2, 1.5),
         audio_data=test_signal,
@@ -34,7 +97,56 @@ def test_simple_simulation():
     assert len(outputs[0]) > 0
     print("✓ Simulation test passed")
 
+def test_threaded_simulation_many_paths():
+    from acoustics_core import AudioSource, Geometry, Microphone
+    
+    # 5000 small triangles: enough paths for the large-batch attenuation code
+    rng = np.random.default_rng(0)
+    v0 = rng.uniform(0, 10, (5000, 3))
+    mesh = Geometry(v0, v0 + rng.uniform(0, 0.5, (5000, 3)),
+                    v0 + rng.uniform(0, 0.5, (5000, 3)), np.zeros(5000, dtype=np.int32))
+    
+    def run(num_workers):
+        sim = AcousticSimulator(mesh, sample_rate=44100)
+        sim.num_workers = num_workers
+        for x in (2, 5):
+            sim.add_source(AudioSource(Vector3(x, 2, 1.5), rng.standard_normal(2205), 44100))
+        for x in (7, 8):
+            sim.add_microphone(Microphone(Vector3(x, 6, 1.5)))
+        return sim.simulate()
+    
+    rng = np.random.default_rng(1)
+    serial = run(1)
+    rng = np.random.default_rng(1)
+    threaded = run(4)
+    assert all(np.array_equal(a, b) for a, b in zip(serial, threaded))
+    print("✓ Threaded many-path simulation test passed")
+
+def test_set_medium():
+    from acoustics_core import AudioSource, Microphone
+    
+    room = GeometryLoader.create_box(Vector3(10, 8, 6), 'concrete')
+    test_signal = np.random.default_rng(0).standard_normal(4410, dtype=np.float32)
+    
+    def build(medium):
+        sim = AcousticSimulator(room, medium=medium, sample_rate=44100)
+        sim.add_source(AudioSource(Vector3(2, 2, 1.5), test_signal, 44100))
+        sim.add_microphone(Microphone(Vector3(8, 6, 1.5)))
+        return sim
+    
+    # Switching an air simulator to water matches one built for water
+    sim = build('air')
+    sim.set_medium('water')
+    assert sim.medium.name == build('water').medium.name
+    assert np.array_equal(sim.simulate()[0], build('water').simulate()[0])
+    print("✓ set_medium test passed")
+
 if __name__ == "__main__":
     test_material_database()
+    test_box_geometry()
+    test_intersect_rays()
+    test_load_obj()
     test_simple_simulation()
+    test_threaded_simulation_many_paths()
+    test_set_medium()
     print("\n✅ All tests passed!")